@@ -4,12 +4,19 @@
 from typing import Any, List, Dict, Optional
 import asyncio
 import logging
-import pubchempy as pcp
 import json
 import os
+import random
+import re
 import requests
 import time
 import configparser
+import functools
+from dataclasses import dataclass
+import orjson
+from diskcache import Cache
+from requests.adapters import HTTPAdapter
+from urllib.parse import quote
 
 # --- 1. SCRIPT CONFIGURATION ---
 # __file__ provides the script's path, os.path.realpath resolves it to an absolute path
@@ -26,7 +33,6 @@ logging.basicConfig(
 )
 
 # --- 2. READING AND CREATING THE CONFIGURATION FILE (config.ini) ---
-config = configparser.ConfigParser()
 CONFIG_FILE_PATH = os.path.join(SCRIPT_DIRECTORY, 'config.ini')
 
 # Template for the default configuration file, with improved comments
@@ -52,99 +58,442 @@ host = 127.0.0.1
 port = 9050
 """
 
-USE_PROXY = False
-proxies = None
-CONNECTION_TYPE = "Direct"
+@dataclass(frozen=True)
+class ProxyConfig:
+    """Validated proxy settings, parsed once from config.ini. The proxy fields are None when use_proxy is off."""
+    use_proxy: bool
+    config_mtime: float
+    proxy_type: Optional[str] = None
+    host: Optional[str] = None
+    port: Optional[int] = None
 
-if not os.path.exists(CONFIG_FILE_PATH):
-    logging.warning(f"config.ini not found. Creating a new one with default safe values.")
-    with open(CONFIG_FILE_PATH, 'w') as configfile:
-        configfile.write(DEFAULT_CONFIG_CONTENT.strip())
+    @property
+    def url(self) -> str:
+        return f'{self.proxy_type}://{self.host}:{self.port}'
 
-config.read(CONFIG_FILE_PATH)
-USE_PROXY = config.getboolean('proxy', 'use_proxy', fallback=False)
+    @property
+    def signature(self) -> list:
+        """Identifies this exact configuration; changes whenever config.ini is edited."""
+        return [self.config_mtime, self.proxy_type, self.host, self.port]
+
+def load_proxy_config(path: str) -> ProxyConfig:
+    """Reads config.ini (creating it with safe defaults if missing) and validates the proxy section."""
+    if not os.path.exists(path):
+        logging.warning(f"config.ini not found. Creating a new one with default safe values.")
+        with open(path, 'w') as configfile:
+            configfile.write(DEFAULT_CONFIG_CONTENT.strip())
+
+    config = configparser.ConfigParser()
+    config.read(path)
+    config_mtime = os.path.getmtime(path)
+    if not config.getboolean('proxy', 'use_proxy', fallback=False):
+        # The remaining proxy settings are irrelevant (and may be blank) when the proxy is off.
+        return ProxyConfig(use_proxy=False, config_mtime=config_mtime)
 
-if USE_PROXY:
     proxy_type = config.get('proxy', 'proxy_type', fallback='socks5h').lower()
-    proxy_host = config.get('proxy', 'host', fallback='127.0.0.1')
-    proxy_port = config.getint('proxy', 'port', fallback=9050)
-    
     if proxy_type not in ['socks5h', 'socks5', 'http', 'https']:
         logging.error(f"Invalid proxy_type '{proxy_type}' in config.ini. Defaulting to 'socks5h'.")
         proxy_type = 'socks5h'
-        
+    return ProxyConfig(
+        use_proxy=True,
+        config_mtime=config_mtime,
+        proxy_type=proxy_type,
+        host=config.get('proxy', 'host', fallback='127.0.0.1'),
+        port=config.getint('proxy', 'port', fallback=9050),
+    )
+
+# The result of a successful Tor check is remembered for a few minutes, so a server that is
+# respawned repeatedly (as MCP stdio servers often are) does not repeat the check every time.
+PROXY_CHECK_CACHE_PATH = os.path.join(LOG_DIRECTORY, ".proxy_check.json")
+PROXY_CHECK_MAX_AGE = 300
+
+def proxy_check_is_fresh(proxy_config: ProxyConfig) -> bool:
+    """Returns True if this exact proxy configuration passed the Tor check recently."""
+    try:
+        with open(PROXY_CHECK_CACHE_PATH) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (state.get('sig') == proxy_config.signature and state.get('ok') is True
+            and time.time() - state.get('checked_at', 0) < PROXY_CHECK_MAX_AGE)
+
+def save_proxy_check(proxy_config: ProxyConfig):
+    """Records a successful Tor check for the given proxy configuration."""
+    try:
+        with open(PROXY_CHECK_CACHE_PATH, 'w') as f:
+            json.dump({'sig': proxy_config.signature, 'ok': True, 'checked_at': time.time()}, f)
+    except OSError as e:
+        logging.warning(f"Could not save the proxy check result: {e}")
+
+PROXY_CONFIG = load_proxy_config(CONFIG_FILE_PATH)
+USE_PROXY = PROXY_CONFIG.use_proxy
+proxies = None
+CONNECTION_TYPE = "Direct"
+
+if USE_PROXY:
+    proxy_type = PROXY_CONFIG.proxy_type
     proxies = {
-       'http': f'{proxy_type}://{proxy_host}:{proxy_port}',
-       'https': f'{proxy_type}://{proxy_host}:{proxy_port}',
+       'http': PROXY_CONFIG.url,
+       'https': PROXY_CONFIG.url,
     }
     CONNECTION_TYPE = f"Proxy {proxy_type.upper()} ({proxies['https']})"
-    logging.info(f"[{proxy_type.upper()} PROXY ENABLED] Will attempt to use proxy at {proxy_host}:{proxy_port}")
-    
-    try:
-        response = requests.get("https://check.torproject.org/", proxies=proxies, timeout=30)
-        response.raise_for_status()
-        if "Congratulations. This browser is configured to use Tor." in response.text:
-            logging.info(f"[{proxy_type.upper()} PROXY CHECK] SUCCESS! Connection through the Tor network verified successfully.")
-        else:
-            logging.warning(f"[{proxy_type.upper()} PROXY CHECK] WARNING: Connection was successful, but the response does not confirm Tor usage.")
-    except requests.exceptions.RequestException as e:
-        logging.critical(f"[{proxy_type.upper()} PROXY CHECK] !! CRITICAL FAILURE !! Could not connect through the proxy. Error: {e}")
-        logging.critical(f"[{proxy_type.upper()} PROXY CHECK] Please ensure the proxy is running and that the required dependency (e.g., PySocks) is installed.")
+    logging.info(f"[{proxy_type.upper()} PROXY ENABLED] Will attempt to use proxy at {PROXY_CONFIG.host}:{PROXY_CONFIG.port}")
+
+    if proxy_check_is_fresh(PROXY_CONFIG):
+        logging.info(f"[{proxy_type.upper()} PROXY CHECK] Skipped: this configuration was verified less than {PROXY_CHECK_MAX_AGE}s ago.")
+    else:
+        try:
+            response = requests.get("https://check.torproject.org/", proxies=proxies, timeout=30)
+            response.raise_for_status()
+            if "Congratulations. This browser is configured to use Tor." in response.text:
+                logging.info(f"[{proxy_type.upper()} PROXY CHECK] SUCCESS! Connection through the Tor network verified successfully.")
+                save_proxy_check(PROXY_CONFIG)
+            else:
+                logging.warning(f"[{proxy_type.upper()} PROXY CHECK] WARNING: Connection was successful, but the response does not confirm Tor usage.")
+        except requests.exceptions.RequestException as e:
+            logging.critical(f"[{proxy_type.upper()} PROXY CHECK] !! CRITICAL FAILURE !! Could not connect through the proxy. Error: {e}")
+            logging.critical(f"[{proxy_type.upper()} PROXY CHECK] Please ensure the proxy is running and that the required dependency (e.g., PySocks) is installed.")
 else:
     logging.info("[PROXY DISABLED] Using a direct connection. Your real IP will be visible to PubChem.")
 
+# --- 3. PERSISTENT HTTP SESSION ---
+# A single pooled session keeps connections (and their TLS handshakes) alive between
+# PubChem requests. The proxy settings are attached once here, so every request made
+# through the session is routed exactly like the configuration above dictates.
+REQUEST_TIMEOUT = 30
+SESSION = requests.Session()
+adapter = HTTPAdapter(pool_connections=50, pool_maxsize=50, max_retries=0)
+SESSION.mount('https://', adapter)
+SESSION.mount('http://', adapter)
+if proxies:
+    SESSION.proxies = proxies
+    # Environment proxy variables would otherwise take precedence over SESSION.proxies.
+    SESSION.trust_env = False
+
+PUG_REST_BASE = "https://pubchem.ncbi.nlm.nih.gov/rest/pug"
+
+# Levels of the statuses in PubChem's X-Throttling-Control header, e.g.
+# "Request Count status: Green (0%), Request Time status: Yellow (55%), Service status: Green (20%)".
+THROTTLE_LEVELS = {"green": 0, "yellow": 1, "red": 2, "black": 3}
+
+class ServerBusyError(Exception):
+    """Raised when PubChem answers 503 (Server Busy), carrying its Retry-After and throttling hints."""
+    def __init__(self, retry_after: Optional[float] = None, throttle_level: int = 0):
+        super().__init__(f"PubChem server busy (Retry-After: {retry_after}, throttle level: {throttle_level})")
+        self.retry_after = retry_after
+        self.throttle_level = throttle_level
+
+class PubChemHTTPError(Exception):
+    """Raised for any other PubChem HTTP error response."""
+
+def parse_retry_after(headers) -> Optional[float]:
+    """Returns the Retry-After header in seconds, or None if it is absent or not numeric."""
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+def parse_throttling_control(headers) -> int:
+    """Returns the worst status in the X-Throttling-Control header (0 = Green ... 3 = Black)."""
+    statuses = re.findall(r'status:\s*(\w+)', headers.get('X-Throttling-Control', ''))
+    return max((THROTTLE_LEVELS.get(status.lower(), 0) for status in statuses), default=0)
+
+def pug_rest_json(url: str, data: Optional[dict] = None):
+    """Sends a PUG-REST request through the pooled SESSION and parses the JSON reply.
+
+    Returns the parsed JSON (None when PubChem answers 404, which is how it reports
+    unknown identifiers) together with the throttle level PubChem reported.
+    """
+    if data is None:
+        response = SESSION.get(url, timeout=REQUEST_TIMEOUT)
+    else:
+        response = SESSION.post(url, data=data, timeout=REQUEST_TIMEOUT)
+    throttle_level = parse_throttling_control(response.headers)
+    if response.status_code == 404:
+        return None, throttle_level
+    if response.status_code == 503:
+        raise ServerBusyError(parse_retry_after(response.headers), throttle_level)
+    if response.status_code >= 400:
+        raise PubChemHTTPError(f"{response.status_code} {response.reason}")
+    return orjson.loads(response.content), throttle_level
+
+# --- 4. ON-DISK CACHE ---
+# Resolved CIDs (keyed by the lowercased name) and property records (keyed by CID) are
+# kept on disk, so repeated searches for the same compounds need no network round-trips.
+# Names that PubChem does not know are remembered too, but only for a few hours so that
+# newly deposited compounds are eventually picked up.
+CACHE_DIRECTORY = os.path.join(SCRIPT_DIRECTORY, "pubchem_cache")
+CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+MISS_CACHE_TTL_SECONDS = 6 * 60 * 60
+cache = Cache(CACHE_DIRECTORY)
+
+def cache_get(namespace: str, key):
+    """Returns a cached value from the given namespace, or None if absent or expired."""
+    raw = cache.get(f"{namespace}:{key}")
+    return orjson.loads(raw) if raw is not None else None
+
+def cache_set(namespace: str, key, value, expire: int = CACHE_TTL_SECONDS):
+    """Stores a JSON-serializable value in the given namespace."""
+    cache.set(f"{namespace}:{key}", orjson.dumps(value), expire=expire)
+
 # MCP Server Initialization
 from mcp.server.fastmcp import FastMCP
 mcp = FastMCP("pubchem")
 
+# --- CONCURRENCY AND RATE LIMITS ---
+# PubChem allows at most 5 requests per second. Every request takes a token from a
+# token bucket refilled at that rate, while the limiter caps the number of searches
+# in flight and backs off when PubChem reports it is busy.
+MAX_CONCURRENT_SEARCHES = 5
+MAX_REQUESTS_PER_SECOND = 5.0
+RETRY_BASE_DELAY = 2.0
+RETRY_MAX_DELAY = 60.0
+# Backoff multipliers for the Yellow, Red and Black throttle levels.
+THROTTLE_BACKOFF_FACTORS = {1: 1.5, 2: 2.0, 3: 4.0}
+
+class AdaptiveLimiter:
+    """Concurrency limiter whose number of permits follows PubChem's load (AIMD).
+
+    The permits are halved every time PubChem reports it is busy, and grow back by one
+    after each full round of successful requests, up to max_permits.
+    """
+    def __init__(self, max_permits: int):
+        self.max_permits = max_permits
+        self.permits = max_permits
+        self._in_use = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_use < self.permits)
+            self._in_use += 1
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self._in_use -= 1
+            self._condition.notify_all()
+
+    def record_success(self):
+        self._successes += 1
+        if self.permits < self.max_permits and self._successes >= self.permits:
+            self.permits += 1
+            self._successes = 0
+
+    def record_throttle(self):
+        self.permits = max(1, self.permits // 2)
+        self._successes = 0
+
+limiter = AdaptiveLimiter(MAX_CONCURRENT_SEARCHES)
+
+class TokenBucket:
+    """Token-bucket rate limiter: `rate` requests per second on average, bursts of up to `capacity`."""
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        """Waits until a token is available and takes it. Waiters are served in FIFO order."""
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                # Sleep exactly until the missing fraction of a token has been refilled.
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+BUCKET = TokenBucket(rate=MAX_REQUESTS_PER_SECOND, capacity=int(MAX_REQUESTS_PER_SECOND))
+
+async def pug_rest_request(url: str, data: Optional[dict] = None):
+    """Rate-limited, non-blocking wrapper around pug_rest_json.
+
+    PubChem warns through X-Throttling-Control before it starts refusing requests, so any
+    status worse than Green already shrinks the limiter.
+    """
+    await BUCKET.acquire()
+    results, throttle_level = await asyncio.to_thread(pug_rest_json, url, data)
+    if throttle_level:
+        limiter.record_throttle()
+        logging.warning(f"PubChem reports throttling (level {throttle_level}). Limit now {limiter.permits}.")
+    return results
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None, throttle_level: int = 0) -> float:
+    """Exponential backoff with jitter, stretched by the throttle level and honoring the
+    server's Retry-After, up to RETRY_MAX_DELAY."""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt) * random.uniform(0.5, 1.5)
+    delay *= THROTTLE_BACKOFF_FACTORS.get(throttle_level, 1.0)
+    if retry_after:
+        delay = max(delay, retry_after)
+    return min(RETRY_MAX_DELAY, delay)
+
 # --- HELPER FUNCTIONS AND SEARCH LOGIC ---
-def compound_to_dict(compound):
-    """Safely converts a PubChemPy Compound object to a Python dictionary."""
-    if not compound: return None
+# PUG-REST property names for each key of the result dictionary. 'synonyms' is not a
+# property in PUG-REST: it needs a separate (and large) request, so it stays None
+# unless synonyms are explicitly requested.
+PUBCHEM_PROPERTY_FIELDS = {
+    "cid": "CID",
+    "iupac_name": "IUPACName",
+    "molecular_formula": "MolecularFormula",
+    "molecular_weight": "MolecularWeight",
+    "monoisotopic_mass": "MonoisotopicMass",
+    "synonyms": None,
+    "charge": "Charge",
+}
+PROPERTY_BATCH_URL = f"{PUG_REST_BASE}/compound/cid/property/IUPACName,MolecularFormula,MolecularWeight,MonoisotopicMass,Charge/JSON"
+SYNONYMS_BATCH_URL = f"{PUG_REST_BASE}/compound/cid/synonyms/JSON"
+COMPOUND_NAME_URL = PUG_REST_BASE + "/compound/name/{}/cids/JSON"
+SUBSTANCE_NAME_URL = PUG_REST_BASE + "/substance/name/{}/cids/JSON"
+PROPERTY_BATCH_SIZE = 100
+
+def compound_to_dict(record):
+    """Converts a PUG-REST property record to a Python dictionary."""
+    if not record: return None
+    return {key: record.get(field) if field else None for key, field in PUBCHEM_PROPERTY_FIELDS.items()}
+
+async def fetch_properties_batch(cids, max_retries: int = 3):
+    """Fetches the properties of many CIDs with one PUG-REST request per batch, keyed by CID."""
+    records = {}
+    missing_cids = []
+    for cid in dict.fromkeys(cids):
+        cached_record = cache_get("record", cid)
+        if cached_record:
+            records[cid] = cached_record
+        else:
+            missing_cids.append(cid)
+    if records:
+        logging.info(f"Properties for {len(records)} CIDs served from the cache.")
+    for start in range(0, len(missing_cids), PROPERTY_BATCH_SIZE):
+        batch = missing_cids[start:start + PROPERTY_BATCH_SIZE]
+        batch_data = {"cid": ",".join(map(str, batch))}
+        for attempt in range(max_retries):
+            try:
+                logging.info(f"Fetching properties for {len(batch)} CIDs (Attempt {attempt + 1}/{max_retries})...")
+                async with limiter:
+                    results = await pug_rest_request(PROPERTY_BATCH_URL, batch_data)
+                limiter.record_success()
+                for record in (results or {}).get("PropertyTable", {}).get("Properties", []):
+                    result_dict = compound_to_dict(record)
+                    if result_dict:
+                        records[result_dict["cid"]] = result_dict
+                        cache_set("record", result_dict["cid"], result_dict)
+                break
+            except ServerBusyError as e:
+                limiter.record_throttle()
+                if attempt + 1 < max_retries:
+                    delay = backoff_delay(attempt, e.retry_after, e.throttle_level)
+                    logging.warning(f"Server busy while fetching properties. Retrying in {delay:.1f} seconds (limit now {limiter.permits})...")
+                    await asyncio.sleep(delay)
+            except Exception as e:
+                logging.error(f"Error while fetching properties for CIDs {batch}: {str(e)}")
+                break
+        else:
+            logging.error(f"Failed to fetch properties for CIDs {batch} after {max_retries} attempts.")
+    return records
+
+async def fetch_synonyms_batch(cids):
+    """Fetches the synonyms of many CIDs, keyed by CID. Best effort: failures only log a warning."""
+    synonyms = {}
+    unique_cids = list(dict.fromkeys(cids))
+    for start in range(0, len(unique_cids), PROPERTY_BATCH_SIZE):
+        batch = unique_cids[start:start + PROPERTY_BATCH_SIZE]
+        try:
+            async with limiter:
+                results = await pug_rest_request(SYNONYMS_BATCH_URL, {"cid": ",".join(map(str, batch))})
+            for information in (results or {}).get("InformationList", {}).get("Information", []):
+                synonyms[information["CID"]] = information.get("Synonym", [])
+        except Exception as e:
+            logging.warning(f"Could not fetch synonyms for CIDs {batch}: {str(e)}")
+    return synonyms
+
+@functools.lru_cache(maxsize=4096)
+def quote_name(name: str) -> str:
+    """URL-quotes a compound name for use as a PUG-REST path segment."""
+    return quote(name, safe='')
+
+async def _compound_cid(quoted_name: str):
+    """Looks up a name in the Compound domain. Returns a CID or None."""
+    # Only the CID is needed here, so skip downloading a full (or 3D) record.
+    results = await pug_rest_request(COMPOUND_NAME_URL.format(quoted_name))
+    cids_from_compound = (results or {}).get("IdentifierList", {}).get("CID", [])
+    if cids_from_compound and cids_from_compound[0]:
+        return cids_from_compound[0]
+    return None
+
+async def _substance_cid(quoted_name: str):
+    """Looks up a name in the Substance domain. Returns the CID of the first matching substance or None."""
+    results = await pug_rest_request(SUBSTANCE_NAME_URL.format(quoted_name))
+    for substance in (results or {}).get("InformationList", {}).get("Information", []):
+        if substance.get("CID"):
+            return substance["CID"][0]
+    return None
+
+def _discard(task: asyncio.Task):
+    """Cancels a task whose result is no longer needed, without leaving its exception unretrieved."""
+    task.cancel()
+    if task.done() and not task.cancelled():
+        task.exception()
+
+async def _lookup_cid(name: str):
+    """Looks up a name in the Compound and Substance domains at the same time. Returns a CID or None.
+
+    A Compound match always wins; the Substance result is only used when the Compound
+    lookup finds nothing, so the fallback no longer costs an extra sequential round-trip.
+    """
+    quoted_name = quote_name(name)
+    logging.info(f"   -> Searching in 'Compound' and 'Substance' domains concurrently")
+    compound_task = asyncio.create_task(_compound_cid(quoted_name))
+    substance_task = asyncio.create_task(_substance_cid(quoted_name))
     try:
-        props = compound.to_dict()
-        keys_to_ensure = ["cid", "iupac_name", "molecular_formula", "molecular_weight", "monoisotopic_mass", "synonyms", "charge"]
-        return {key: props.get(key) for key in keys_to_ensure}
-    except Exception as e:
-        logging.error(f"Could not convert compound to dictionary: {e}")
-        return None
+        cid = await compound_task
+    except BaseException:
+        _discard(substance_task)
+        raise
+    if cid:
+        _discard(substance_task)
+        return cid
+    logging.warning(f"   -> Search in 'Compound' failed. Using the 'Substance' domain result...")
+    return await substance_task
 
-def search_by_name_with_retries(name: str, max_retries: int = 3, retry_delay: int = 5):
-    """Searches for a compound using a fallback strategy (Compound -> Substance) and retries."""
+async def search_by_name_with_retries(name: str, max_retries: int = 3):
+    """Resolves a name to a CID using a fallback strategy (Compound -> Substance) and retries."""
+    name_key = name.strip().lower()
+    cached_cid = cache_get("cid", name_key)
+    if cached_cid:
+        logging.info(f"CID for '{name}' served from the cache: {cached_cid}.")
+        return {"cid": cached_cid, "search_term": name}
+    if cache_get("misses", name_key):
+        logging.info(f"'{name}' was recently not found in PubChem; skipping the search.")
+        return {"error": f"Compound '{name}' not found in PubChem.", "compound_name": name}
     for attempt in range(max_retries):
         try:
             logging.info(f"Searching ({CONNECTION_TYPE}): '{name}' (Attempt {attempt + 1}/{max_retries})...")
-            cid = None
-            logging.info(f"   -> Attempt 1: Searching in 'Compound' domain")
-            compounds = pcp.get_compounds(name, 'name', record_type='3d', max_records=1, proxies=proxies)
-            if compounds and hasattr(compounds[0], 'cid') and compounds[0].cid:
-                cid = compounds[0].cid
-            if not cid:
-                logging.warning(f"   -> Search in 'Compound' failed. Falling back to 'Substance' domain...")
-                cids_from_substance = pcp.get_cids(name, 'name', 'substance', proxies=proxies)
-                if cids_from_substance:
-                    first_result = cids_from_substance[0]
-                    if 'CID' in first_result and first_result['CID']:
-                        cid = first_result['CID'][0]
+            async with limiter:
+                cid = await _lookup_cid(name)
+            limiter.record_success()
             if not cid:
                 logging.warning(f"No valid CID found for '{name}' in any domain.")
+                cache_set("misses", name_key, True, expire=MISS_CACHE_TTL_SECONDS)
                 return {"error": f"Compound '{name}' not found in PubChem.", "compound_name": name}
-            logging.info(f"CID found for '{name}': {cid}. Fetching full record...")
-            full_compound = pcp.Compound.from_cid(cid, proxies=proxies)
-            result_dict = compound_to_dict(full_compound)
-            if result_dict:
-                result_dict['search_term'] = name
-                return result_dict
-            else:
-                return {"error": f"Could not process full record for '{name}' (CID: {cid}).", "compound_name": name}
-        except pcp.PubChemHTTPError as e:
-            if 'Server Busy' in str(e) or '503' in str(e):
-                logging.warning(f"Server busy for '{name}'. Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
-                continue
-            else:
-                logging.error(f"PubChem HTTP Error for '{name}': {e}")
-                return {"error": f"Compound '{name}' not found in PubChem (HTTP Error).", "compound_name": name}
+            logging.info(f"CID found for '{name}': {cid}.")
+            cache_set("cid", name_key, cid)
+            return {"cid": cid, "search_term": name}
+        except ServerBusyError as e:
+            limiter.record_throttle()
+            if attempt + 1 < max_retries:
+                delay = backoff_delay(attempt, e.retry_after, e.throttle_level)
+                logging.warning(f"Server busy for '{name}'. Retrying in {delay:.1f} seconds (limit now {limiter.permits})...")
+                await asyncio.sleep(delay)
+        except PubChemHTTPError as e:
+            logging.error(f"PubChem HTTP Error for '{name}': {e}")
+            return {"error": f"Compound '{name}' not found in PubChem (HTTP Error).", "compound_name": name}
         except Exception as e:
             logging.error(f"General error while searching for '{name}': {str(e)}")
             return {"error": f"General error for '{name}': {str(e)}", "compound_name": name}
@@ -152,27 +501,38 @@ def search_by_name_with_retries(name: str, max_retries: int = 3, retry_delay: in
     return {"error": f"Failed to get data for '{name}' after {max_retries} retries.", "compound_name": name}
 
 def log_results_to_file(data):
-    """Helper function to log results to the debug file."""
+    """Helper function to log results to the debug file, one JSON object per line."""
     logging.info("--- DEBUG: DATA BEING SENT TO LLM ---")
-    results_as_json_string = json.dumps(data, indent=2)
-    logging.info(results_as_json_string)
+    for row in data:
+        logging.info(orjson.dumps(row).decode())
     logging.info("--- END OF DATA ---")
 
 @mcp.tool()
-async def search_compounds_by_name(names: List[str]) -> List[Dict[str, Any]]:
+async def search_compounds_by_name(names: List[str], include_synonyms: bool = False) -> List[Dict[str, Any]]:
     """
-    Searches for multiple compounds by name using a smart fallback strategy, one by one, with pauses and retries.
+    Searches for multiple compounds by name using a smart fallback strategy, concurrently, with rate limiting and retries.
     Args:
         names: A list of compound names. Example: ["Aspirin", "Hydroxocobalamin"]
+        include_synonyms: Also return each compound's list of synonyms (can be very long). Defaults to False.
     """
-    PAUSE_BETWEEN_REQUESTS = 2.0
-    logging.info(f"Initiating SMART and SEQUENTIAL search for {len(names)} compounds...")
+    logging.info(f"Initiating SMART and CONCURRENT search for {len(names)} compounds (max {MAX_CONCURRENT_SEARCHES} at a time)...")
+    tasks = [asyncio.create_task(search_by_name_with_retries(name)) for name in names]
+    resolved = await asyncio.gather(*tasks)
+
+    # All properties are fetched together instead of one full record per compound.
+    cids = [result["cid"] for result in resolved if "cid" in result]
+    records = await fetch_properties_batch(cids) if cids else {}
+    synonyms = await fetch_synonyms_batch(cids) if cids and include_synonyms else {}
     all_results = []
-    for name in names:
-        result = await asyncio.to_thread(search_by_name_with_retries, name)
-        all_results.append(result)
-        logging.info(f"Pausing for {PAUSE_BETWEEN_REQUESTS}s.")
-        await asyncio.sleep(PAUSE_BETWEEN_REQUESTS)
+    for name, result in zip(names, resolved):
+        if "error" in result:
+            all_results.append(result)
+            continue
+        record = records.get(result["cid"])
+        if record:
+            all_results.append({**record, "synonyms": synonyms.get(result["cid"]), "search_term": name})
+        else:
+            all_results.append({"error": f"Could not process full record for '{name}' (CID: {result['cid']}).", "compound_name": name})
     log_results_to_file(all_results)
     return all_results
 